@@ -1,24 +1,103 @@
+import io
 import json
 import logging
-import math
 import os
+import re
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 import backoff
-import bs4
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from lxml import etree
+
+# orjson parses bytes directly and is faster, but the stdlib parser works as a fallback
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 urllib3.disable_warnings()
 
 # Change logging.INFO to logging.DEBUG for more detailed output
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+_SESSION_EXPIRED_MARKER = b"Oops, you must log into this application before loading that link."
+_ENROLL_FAILED_MARKER = b"Failed"
+
+# Term data is embedded in the criteria page as the argument to EE.initEntrance(...)
+_TERM_DATA_RE = re.compile(rb"return EE\.initEntrance\((.*?)\);", re.DOTALL)
+
+_DAY_MAP = {"1": "Mon", "2": "Tue", "3": "Wed", "4": "Thu", "5": "Fri", "6": "Sat", "7": "Sun"}
+_DAY_ORDER_INDEX = {day: index for index, day in enumerate(["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun", "Unk"])}
+
+def _format_minute(minute: int, hour_12: bool) -> str:
+    """Formats minutes since midnight as a clock time, e.g. 810 -> "01:30 PM" / "13:30"."""
+    hour, minute = divmod(minute, 60)
+    if hour_12:
+        return f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+    return f"{hour:02d}:{minute:02d}"
+
+
+# Every minute of the day formatted up front; values outside the day fall back to _format_minute
+_MINUTES_PER_DAY = 24 * 60
+_TIME_12H = [_format_minute(minute, True) for minute in range(_MINUTES_PER_DAY)]
+_TIME_24H = [_format_minute(minute, False) for minute in range(_MINUTES_PER_DAY)]
+
+# Discord accepts at most this many embeds in a single webhook message
+DISCORD_MAX_EMBEDS = 10
+
+
 class CUNYException(Exception):
     pass
 
 
+class SessionExpired(CUNYException):
+    def __init__(self, message: str, login_generation: int | None = None):
+        super().__init__(message)
+        # Which login the expired request was sent under, so concurrent failures trigger a single re-login
+        self.login_generation = login_generation
+
+
+@dataclass(slots=True)
+class Section:
+    """A watched class section as seen in one class-data response."""
+    course_number: str
+    code: str
+    term: str
+    college: str
+    instructor: str
+    time: str
+    waitlist: str
+    seats: str
+    available: int
+    enrolled: bool
+
+
+def _is_permanent_http_error(exception: Exception) -> bool:
+    """backoff giveup check: 4xx responses won't succeed on a retry, unlike 5xx ones."""
+    response = getattr(exception, "response", None)
+    return isinstance(exception, requests.exceptions.HTTPError) and response is not None and response.status_code < 500
+
+
+def _relogin(details: dict) -> None:
+    """backoff hook that logs the client back in before the next attempt."""
+    # Transient network errors are just retried; only an expired session needs a new login
+    if isinstance(details.get("exception"), requests.exceptions.RequestException):
+        return
+    client = details["args"][0]
+    logging.debug(f"Retrying {details['target'].__name__} after logging in again...")
+    client._login(expired_generation=getattr(details.get("exception"), "login_generation", None))
+
+
 class CUNY:
 
     main_url = "https://cssa.cunyfirst.cuny.edu/psc/cnycsprd/EMPLOYEE/SA/s/WEBLIB_VSB.TRANSFER_FUNCS.FieldFormula.IScript_RedirectVSBuilder?INSTITUTION=LAG01"
@@ -31,22 +110,80 @@ class CUNY:
     enroll_options_url = "https://sb.cunyfirst.cuny.edu/api/enroll-options"
     perform_action_url = "https://sb.cunyfirst.cuny.edu/api/perform-action"
 
-    def __init__(self, username, password):
-        """Initializes the CUNY client with credentials."""
+    # Seconds before a course the search couldn't resolve is looked up again, e.g. one not yet published
+    college_cache_ttl = 10 * 60
+
+    # Seconds an enrollment state lookup is reused for
+    enrollment_cache_ttl = 10
+
+    # Terms only change once a semester, so they are cached on disk between runs
+    terms_cache_file = os.path.join(os.path.expanduser("~"), ".cache", "cuny_scheduler", "terms.json")
+    terms_cache_ttl = 60 * 60
+
+    def __init__(self, username, password, cookie_file: str | None = None):
+        """Initializes the CUNY client with credentials, optionally persisting session cookies to cookie_file."""
         logging.debug("Initializing CUNY client...")
         self.username = username
         self.password = password
-        self.headers = {"User-Agent": "CUNY/1.0"}
+        self.cookie_file = cookie_file
+
+        # A single pooled session keeps cookies and HTTPS connections alive across calls
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=0))
+        # Compressed bodies are decoded transparently by urllib3
+        self.session.headers.update({"User-Agent": "CUNY/1.0", "Accept-Encoding": "gzip, deflate"})
 
-        self.cookies = {}
         self.terms = None
+        # Wall-clock time the terms were fetched, comparable with the cache file's mtime
+        self._terms_fetched_at = 0.0
+        # Course to college mappings never change within a term, so they are kept for the client's lifetime
+        self._college_map_by_term: dict[str, dict[str, str]] = {}
+        # Per term, when each course the search couldn't resolve was last asked for
+        self._unresolved_courses_by_term: dict[str, dict[str, float]] = {}
+        self._enrollment_cache: dict[str, tuple[float, set[str]]] = {}
+        self._nwindow_cache = (None, None)
+        self._login_lock = threading.Lock()
+        # Bumped after every completed login
+        self._login_generation = 0
 
         self._setup()
         logging.debug("CUNY client initialized.")
 
     def _setup(self):
-        self._login()
-        self.terms = self._get_term()
+        # Saved cookies may have expired; the first request that notices logs in again
+        if not self._load_cookies():
+            self._login()
+        self._get_term()
+
+    def _load_cookies(self) -> bool:
+        """Loads session cookies saved by a previous run, if there are any."""
+        if not self.cookie_file or not os.path.exists(self.cookie_file):
+            return False
+        try:
+            with open(self.cookie_file, "r", encoding="utf-8") as f:
+                cookies = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not load saved cookies from {self.cookie_file}: {e}")
+            return False
+        self.session.cookies.update(cookies)
+        logging.debug(f"Loaded saved cookies from {self.cookie_file}")
+        return bool(cookies)
+
+    def _save_cookies(self) -> None:
+        """Saves the current session cookies so the next run can skip logging in."""
+        if not self.cookie_file:
+            return
+        temp_file = f"{self.cookie_file}.tmp"
+        try:
+            # These are live session cookies, so only the owner may read them
+            fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                # The mode passed to os.open doesn't apply to a temp file left over from an earlier run
+                os.fchmod(f.fileno(), 0o600)
+                json.dump(self.session.cookies.get_dict(), f)
+            os.replace(temp_file, self.cookie_file)
+        except OSError as e:
+            logging.warning(f"Could not save cookies to {self.cookie_file}: {e}")
 
     @backoff.on_exception(
         backoff.expo,
@@ -56,9 +193,9 @@ class CUNY:
     def _get(self, url: str, params: dict = None, headers: dict = None, **kwargs) -> requests.Response:
         """Performs a GET request with the specified URL and parameters."""
         logging.debug(f"GET request to {url} with params {params}")
-        headers = headers or {}
-        headers.update(self.headers)
-        response = requests.get(url, params=params, cookies=self.cookies, headers=headers, allow_redirects=False, **kwargs)
+        login_generation = self._login_generation
+        response = self.session.get(url, params=params, headers=headers, allow_redirects=False, **kwargs)
+        response.login_generation = login_generation
         response.raise_for_status()
         return response
     
@@ -70,163 +207,207 @@ class CUNY:
     def _post(self, url: str, data: dict = None, headers: dict = None, **kwargs) -> requests.Response:
         """Performs a POST request with the specified URL and data."""
         logging.debug(f"POST request to {url} with data {data}")
-        headers = headers or {}
-        headers.update(self.headers)
-        response = requests.post(url, data=data, cookies=self.cookies, headers=headers, allow_redirects=False, **kwargs)
+        login_generation = self._login_generation
+        response = self.session.post(url, data=data, headers=headers, allow_redirects=False, **kwargs)
+        response.login_generation = login_generation
         response.raise_for_status()
         return response
     
-    def _check_session_text(self, text: str) -> None:
-        if "Oops, you must log into this application before loading that link." in text:
-            # raise CUNYException("Session expired. Please log in again.")
-            logging.error("Session expired. Please log in again.")
-            exit(0)
+    def _check_session(self, response: requests.Response) -> None:
+        """Checks the raw response body for the logged-out page without decoding it."""
+        if _SESSION_EXPIRED_MARKER in response.content:
+            raise SessionExpired("Session expired. Please log in again.", getattr(response, "login_generation", None))
 
     def _nWindow(self):
         """Generates time-based parameters required for the class data API request."""
-        t = math.floor(time.time() / 60) % 1000
+        bucket = int(time.time()) // 60
+        cached_bucket, cached_window = self._nwindow_cache
+        if bucket == cached_bucket:
+            # Callers only read the window, so the cached dict is shared
+            return cached_window
+
+        t = bucket % 1000
         e = t % 3 + t % 39 + t % 42
         logging.debug(f"_nWindow generated: t={t}, e={e}")
-        return {"t": t, "e": e}
-    
-    def _get_session_id(self):
-        """Initializes the session ID for the CUNYfirst login for enrollment later on."""
-        logging.debug("Getting session ID...")
-        response = self._get(self.main_url, verify=False)
-        return response.cookies.get_dict()
+        window = {"t": t, "e": e}
+        self._nwindow_cache = (bucket, window)
+        return window
     
-    def _login(self):
-        """Login to CUNYfirst using the provided username and password."""
-        session_cookies = self._get_session_id()
-
-        logging.debug("Executing Step 1: Initial VSB redirect...")
-        s1_response = self._get(self.main_url, verify=False)
-        self.cookies.update(s1_response.cookies.get_dict())
-
-        if s1_response.headers.get('Location') == "http://portaldown.cuny.edu/cunyfirst":
-            logging.error("CUNY is down right now. Skipping login.")
-            return
-        
-        logging.debug("Executing Step 2: Redirect to SSO login...")
-        s2_response = self._get(s1_response.headers['Location'])
-        self.cookies.update(s2_response.cookies.get_dict())
-
-        logging.debug("Executing Step 3: Submitting credentials...")
-        s3_response = self._post(self.auth_url, data={"username": self.username, "password": self.password})
-        self.cookies.update(s3_response.cookies.get_dict())
-
-        logging.debug("Executing Step 4: Following post-authentication redirect...")
-        s4_response = self._get(s3_response.headers['Location'], verify=False)
-        self.cookies = s4_response.cookies.get_dict()
-
-        logging.debug("Executing Step 5: Re-accessing main VSB URL...")
-        s5_response = self._get(self.main_url, verify=False)
-        self.cookies.update(s5_response.cookies.get_dict())
+    def _login(self, expired_generation: int | None = None):
+        """Login to CUNYfirst using the provided username and password.
+
+        When expired_generation is given, the login is skipped if another thread has logged in since then.
+        """
+        # Term workers can hit an expired session at the same time, so only one logs in at a time
+        with self._login_lock:
+            if expired_generation is not None and expired_generation != self._login_generation:
+                logging.debug("Session was already refreshed by another worker. Skipping login.")
+                return
+
+            logging.debug("Executing Step 1: Initial VSB redirect...")
+            s1_response = self._get(self.main_url, verify=False)
+            # Session ID cookies, needed again for enrollment after the cookie resets below
+            session_cookies = s1_response.cookies.get_dict()
+
+            # Checked before following the redirect, since the portal-down page itself may not load
+            if s1_response.headers.get('Location') == "http://portaldown.cuny.edu/cunyfirst":
+                logging.error("CUNY is down right now. Skipping login.")
+                return
+
+            logging.debug("Executing Step 2: Redirect to SSO login...")
+            self._get(s1_response.headers['Location'])
+
+            logging.debug("Executing Step 3: Submitting credentials...")
+            s3_response = self._post(self.auth_url, data={"username": self.username, "password": self.password})
+
+            logging.debug("Executing Step 4: Following post-authentication redirect...")
+            s4_response = self._get(s3_response.headers['Location'], verify=False)
+            # Only the post-authentication cookies should be carried into the VSB steps
+            self.session.cookies.clear()
+            self.session.cookies.update(s4_response.cookies.get_dict())
+
+            logging.debug("Executing Step 5: Re-accessing main VSB URL...")
+            self._get(self.main_url, verify=False)
         
-        logging.debug("Executing Step 6: Accessing VSB URL variation for API cookies...")
-        s6_response = self._get(self.main_url + "&", verify=False)
-        self.cookies.update(s6_response.cookies.get_dict())
+            logging.debug("Executing Step 6: Accessing VSB URL variation for API cookies...")
+            s6_response = self._get(self.main_url + "&", verify=False)
 
-        logging.debug("Executing Step 7: Refreshing WEB Session Cookie...")
-        s7_response = self._get(self.page_url, verify=False)
+            logging.debug("Executing Step 7: Refreshing WEB Session Cookie...")
+            s7_response = self._get(self.page_url, verify=False)
 
-        self.cookies = s6_response.cookies.get_dict()
-        self.cookies.update(session_cookies)
-        self.cookies.update(s7_response.cookies.get_dict())
+            self.session.cookies.clear()
+            self.session.cookies.update(s6_response.cookies.get_dict())
+            self.session.cookies.update(session_cookies)
+            self.session.cookies.update(s7_response.cookies.get_dict())
+            self._login_generation += 1
+            self._save_cookies()
 
     def _get_day(self, day: str) -> str:
         """Converts numeric day representation (from HTML) to abbreviated day name."""
-        match day:
-            case "1": return "Mon"
-            case "2": return "Tue"
-            case "3": return "Wed"
-            case "4": return "Thu"
-            case "5": return "Fri"
-            case "6": return "Sat"
-            case "7": return "Sun"
-            case _: return "Unk"
-
-    def _build_time(self, timeblock_ids: list[str], timeblocks: dict[str, bs4.element.Tag], hour_12: bool = True) -> str:
-        """Constructs a human-readable time string from timeblock data."""
-        days_by_time = {}
+        return _DAY_MAP.get(day, "Unk")
+
+    def _build_time(self, timeblock_ids: list[str], timeblocks: dict[str, tuple[str, str, str]], hour_12: bool = True) -> str:
+        """Constructs a human-readable time string from (day, t1, t2) timeblock data."""
+        days_by_time = defaultdict(list)
+        times = _TIME_12H if hour_12 else _TIME_24H
 
         for timeblock_id in timeblock_ids:
             if timeblock_id not in timeblocks:
                 logging.warning(f"Timeblock ID {timeblock_id} not found in timeblocks map.")
                 continue
-            timeblock = timeblocks[timeblock_id]
-            day_abbr = self._get_day(timeblock.attrs.get('day', ''))
-
-            t1 = int(timeblock.attrs.get('t1', 0))
-            h1 = t1 // 60
-            m1 = t1 % 60
+            day, start, end = timeblocks[timeblock_id]
+            day_abbr = self._get_day(day)
 
-            t2 = int(timeblock.attrs.get('t2', 0))
-            h2 = t2 // 60
-            m2 = t2 % 60
-
-            if hour_12:
-                a1 = "AM" if h1 < 12 else "PM"
-                h1 = h1 % 12
-                if h1 == 0:
-                    h1 = 12
-
-                a2 = "AM" if h2 < 12 else "PM"
-                h2 = h2 % 12
-                if h2 == 0:
-                    h2 = 12
-
-                time_str = f"{h1:02d}:{m1:02d} {a1} to {h2:02d}:{m2:02d} {a2}"
-            else:
-                time_str = f"{h1:02d}:{m1:02d} to {h2:02d}:{m2:02d}"
+            # t1/t2 are minutes since midnight; an end of 1440 is midnight and renders as "24:00"
+            t1 = int(start)
+            t2 = int(end)
+            s1 = times[t1] if 0 <= t1 < _MINUTES_PER_DAY else _format_minute(t1, hour_12)
+            s2 = times[t2] if 0 <= t2 < _MINUTES_PER_DAY else _format_minute(t2, hour_12)
+            time_str = f"{s1} to {s2}"
 
-            if time_str not in days_by_time:
-                days_by_time[time_str] = []
             days_by_time[time_str].append(day_abbr)
 
-        day_order = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun", "Unk"]
         time_parts = []
         for time_str, days in days_by_time.items():
-            sorted_days = sorted(list(set(days)), key=lambda day: day_order.index(day) if day in day_order else len(day_order))
+            sorted_days = sorted(dict.fromkeys(days), key=lambda day: _DAY_ORDER_INDEX.get(day, len(_DAY_ORDER_INDEX)))
             time_parts.append(f"{', '.join(sorted_days)}: {time_str}")
 
         return "\n".join(time_parts) if time_parts else "TBA"
 
+    def _get_colleges(self, term: str, course_names: list[str]) -> dict[str, str]:
+        """Returns college data for specified courses, only fetching the courses not already known for the term."""
+        known_colleges = self._college_map_by_term.setdefault(term, {})
+        # Courses the search couldn't resolve are only asked for again once college_cache_ttl has passed
+        unresolved_courses = self._unresolved_courses_by_term.setdefault(term, {})
+        now = time.monotonic()
+        missing_courses = [
+            course for course in course_names
+            if course not in known_colleges
+            and (course not in unresolved_courses or now - unresolved_courses[course] >= self.college_cache_ttl)
+        ]
+        if missing_courses:
+            fetched_colleges = self._fetch_colleges(term, missing_courses)
+            known_colleges.update(fetched_colleges)
+            for course in missing_courses:
+                if course in fetched_colleges:
+                    unresolved_courses.pop(course, None)
+                else:
+                    unresolved_courses[course] = now
+        return {course: known_colleges[course] for course in course_names if course in known_colleges}
+
     @backoff.on_exception(
         backoff.expo,
-        CUNYException,
+        SessionExpired,
         max_tries=2,
-        on_backoff=_login
+        on_backoff=_relogin
     )
-    def _get_colleges(self, term: str, course_names: list[str]) -> dict[str, str]:
+    def _fetch_colleges(self, term: str, course_names: list[str]) -> dict[str, str]:
         """Fetches college data for specified courses."""
         logging.debug(f"Fetching colleges for courses: {course_names}")
         data = {"term": term, "itemnames": ",".join(course_names)}
-        headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = self._post(self.search_url, data=data, headers=headers)
-        self._check_session_text(response.text)
-        course_college_map = {course['cnKey']: course['va'] for course in response.json() if 'cnKey' in course}
+        response = self._post(self.search_url, data=data, headers=_FORM_HEADERS)
+        self._check_session(response)
+        course_college_map = {course['cnKey']: course['va'] for course in _json_loads(response.content) if 'cnKey' in course}
         logging.debug(f"Course to college mapping: {json.dumps(course_college_map, indent=2)}")
 
         return course_college_map
 
+    def _get_term(self, force_refresh: bool = False) -> dict:
+        """Returns the available terms, only hitting the criteria page when they aren't known or cached on disk."""
+        if not force_refresh:
+            # The in-memory copy ages out like the disk cache, so a long polling run picks up newly enrollable terms
+            if self.terms and time.time() - self._terms_fetched_at < self.terms_cache_ttl:
+                return self.terms
+            cached_terms = self._load_cached_terms()
+            if cached_terms:
+                self._terms_fetched_at, self.terms = cached_terms
+                return self.terms
+
+        self.terms = self._fetch_term()
+        self._terms_fetched_at = time.time()
+        self._save_cached_terms(self.terms)
+        return self.terms
+
+    def _load_cached_terms(self) -> tuple[float, dict] | None:
+        """Loads terms saved by a recent run with the time they were saved, if the cache file is younger than terms_cache_ttl."""
+        try:
+            saved_at = os.path.getmtime(self.terms_cache_file)
+            if time.time() - saved_at >= self.terms_cache_ttl:
+                return None
+            with open(self.terms_cache_file, "r", encoding="utf-8") as f:
+                term_map = json.load(f)
+        except (OSError, ValueError):
+            return None
+        logging.debug(f"Loaded cached terms from {self.terms_cache_file}")
+        return saved_at, term_map
+
+    def _save_cached_terms(self, term_map: dict) -> None:
+        """Saves the terms so runs within the next terms_cache_ttl seconds can skip the criteria page."""
+        temp_file = f"{self.terms_cache_file}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.terms_cache_file), exist_ok=True)
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(term_map, f)
+            os.replace(temp_file, self.terms_cache_file)
+        except OSError as e:
+            logging.warning(f"Could not save terms to {self.terms_cache_file}: {e}")
+
     @backoff.on_exception(
         backoff.expo,
-        CUNYException,
+        SessionExpired,
         max_tries=2,
-        on_backoff=_login
+        on_backoff=_relogin
     )
-    def _get_term(self) -> dict:
+    def _fetch_term(self) -> dict:
         """Fetches available terms from the criteria page."""
         logging.debug("Fetching available terms...")
 
-        if self.terms:
-            return self.terms
-
         response = self._get(self.page_url)
-        self._check_session_text(response.text)
-        js_data_str = response.text.split("return EE.initEntrance(")[1].split(");")[0]
-        term_json = json.loads(js_data_str)
+        self._check_session(response)
+        match = _TERM_DATA_RE.search(response.content)
+        if not match:
+            raise CUNYException("Could not find term data on the criteria page.")
+        term_json = _json_loads(match.group(1))
 
         term_map = {}
         for term_id, term_data in term_json.items():
@@ -239,19 +420,28 @@ class CUNY:
 
     @backoff.on_exception(
         backoff.expo,
-        CUNYException,
+        SessionExpired,
         max_tries=2,
-        on_backoff=_login
+        on_backoff=_relogin
     )
-    def get_enrollment_status(self, term: str, course_name: str) -> bool:
-        """Fetches the enrollment status for a given term."""
+    def _fetch_enrolled_courses(self, term: str) -> set[str]:
+        """Fetches the courses enrolled in for a given term, reusing a result from the last few seconds."""
+        cached = self._enrollment_cache.get(term)
+        if cached and time.monotonic() - cached[0] < self.enrollment_cache_ttl:
+            return cached[1]
+
         logging.debug(f"Fetching enrollment status for term {term}...")
         response = self._get(self.enrollment_state_url, params={"term": term})
-        self._check_session_text(response.text)
-        enrollment_data = response.json()
-        enrolled_courses = [course["cnKey"] for course in enrollment_data["cnfs"]]
+        self._check_session(response)
+        enrollment_data = _json_loads(response.content)
+        enrolled_courses = {course["cnKey"] for course in enrollment_data["cnfs"]}
         logging.debug(f"Enrolled courses: {enrolled_courses}")
-        return course_name in enrolled_courses
+        self._enrollment_cache[term] = (time.monotonic(), enrolled_courses)
+        return enrolled_courses
+
+    def get_enrollment_status(self, term: str, course_name: str) -> bool:
+        """Fetches the enrollment status for a given term."""
+        return course_name in self._fetch_enrolled_courses(term)
 
     def try_enroll(self, term: str, selection_key: str, selection_va: str) -> bool:
         """Attempts to enroll in a class section using the provided selection key and VA."""
@@ -277,16 +467,22 @@ class CUNY:
             "schoolTermId": term
         }
         response = self._get(self.perform_action_url, params=params)
-        logging.debug(f"Enrollment attempt response: {response.text}")
-        return True if response.status_code == 200 and "Failed" not in response.text else False
+        # Only decode the body when it will actually be logged
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug(f"Enrollment attempt response: {response.text}")
+        return response.status_code == 200 and _ENROLL_FAILED_MARKER not in response.content
 
     @backoff.on_exception(
         backoff.expo,
-        CUNYException,
-        max_tries=2,
-        on_backoff=_login
+        (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError, SessionExpired),
+        max_tries=4,
+        max_time=30,
+        jitter=backoff.full_jitter,
+        base=1,
+        giveup=_is_permanent_http_error,
+        on_backoff=_relogin
     )
-    def get_class_data(self, term: str, course_names: list[str], course_codes: list[str]) -> list[dict]:
+    def get_class_data(self, term: str, course_names: list[str], course_codes: list[str] | frozenset[str]) -> list[Section]:
         """Fetches class section data for specified courses in a given term."""
         logging.debug(f"Getting class data for courses {course_names} (sections {course_codes}) in term {term}...")
 
@@ -294,6 +490,7 @@ class CUNY:
             "term": term
         }
         parameters.update(self._nWindow())
+
         course_college_map = self._get_colleges(term, course_names)
         
         if not course_college_map:
@@ -308,121 +505,166 @@ class CUNY:
             parameters[f"va_{index}_0"] = course_college_map[course]
 
         response = self._get(self.class_data_url, params=parameters, verify=False)
-        self._check_session_text(response.text)
+        self._check_session(response)
+
+        target_codes = frozenset(course_codes)
+
+        # Single streaming pass: keep only the attributes of timeblocks and of the watched sections.
+        # The enclosing course and selection are tracked from their start events instead of walking up from each block.
+        timeblocks_map = {}
+        matched_sections = []
+        current_course = None
+        current_selection = {}
+        for event, element in etree.iterparse(io.BytesIO(response.content), events=("start", "end"), tag=("course", "selection", "timeblock", "block"), recover=True, huge_tree=True):
+            if event == "start":
+                if element.tag == "course":
+                    current_course = element
+                elif element.tag == "selection":
+                    current_selection = dict(element.attrib)
+            elif element.tag == "course":
+                current_course = None
+            elif element.tag == "selection":
+                current_selection = {}
+            elif element.tag == "timeblock":
+                if element.get('id'):
+                    # Only the fields _build_time reads are kept
+                    timeblocks_map[element.get('id')] = (element.get('day', ''), element.get('t1', '0'), element.get('t2', '0'))
+                element.clear()
+            elif element.get('key') in target_codes:
+                matched_sections.append((dict(element.attrib), current_course, current_selection))
+            else:
+                element.clear()
+
+        # The campus sits under the course's parent; look it up once per parent rather than once per section
+        campus_by_parent = {}
 
         class_data = []
-        soup = bs4.BeautifulSoup(response.text, "html.parser")
-
-        all_timeblocks = soup.find_all("timeblock")
-        timeblocks_map = {tb.attrs.get('id'): tb for tb in all_timeblocks if tb.attrs.get('id')}
-
-        for course_section in soup.find_all("block"):
-            section_code = course_section.attrs.get('key')
-            if section_code in course_codes:
-                parent_course = course_section.find_parent("course")
-                college = parent_course.parent.find("campus").attrs.get('v', 'N/A')
-                course_number = parent_course.attrs.get('key', 'N/A') if parent_course else 'N/A'
-
-                timeblock_ids = course_section.attrs.get('timeblockids', '').split(",")
-                valid_timeblock_ids = [tid for tid in timeblock_ids if tid]
-
-                try:
-                    waitlist_cap = int(course_section.attrs.get('wc', 0))
-                    waitlist_students = int(course_section.attrs.get('ws', 0))
-                    max_enrollment = int(course_section.attrs.get('me', 0))
-                    open_seats_val = int(course_section.attrs.get('os', 0))
-
-                    waitlist_available = waitlist_cap - waitlist_students
-                    seats_available = open_seats_val
-                    is_open = waitlist_students > 0 or seats_available > 0
-                except ValueError:
-                    logging.warning(f"Could not parse seat/waitlist numbers for section {section_code}")
-                    waitlist_str = "Err/Err"
-                    seats_str = "Err/Err"
-                    available = -1
+        # Fetched at most once per call, and only if a watched section is actually open
+        enrolled_courses = None
+        for course_section, parent_course, selection in matched_sections:
+            section_code = course_section.get('key')
+            if parent_course is not None:
+                course_parent = parent_course.getparent()
+                if course_parent not in campus_by_parent:
+                    campus = course_parent.find(".//campus")
+                    campus_by_parent[course_parent] = campus.get('v', 'N/A') if campus is not None else 'N/A'
+                college = campus_by_parent[course_parent]
+                course_number = parent_course.get('key', 'N/A')
+            else:
+                college = 'N/A'
+                course_number = 'N/A'
+
+            timeblock_ids = course_section.get('timeblockids', '').split(",")
+            valid_timeblock_ids = [tid for tid in timeblock_ids if tid]
+
+            try:
+                waitlist_cap = int(course_section.get('wc', 0))
+                waitlist_students = int(course_section.get('ws', 0))
+                max_enrollment = int(course_section.get('me', 0))
+                open_seats_val = int(course_section.get('os', 0))
+
+                waitlist_available = waitlist_cap - waitlist_students
+                seats_available = open_seats_val
+                is_open = waitlist_students > 0 or seats_available > 0
+            except ValueError:
+                logging.warning(f"Could not parse seat/waitlist numbers for section {section_code}")
+                waitlist_str = "Err/Err"
+                seats_str = "Err/Err"
+                available = -1
+            else:
+                waitlist_str = f"{waitlist_available}/{waitlist_cap}"
+                seats_str = f"{max_enrollment - seats_available}/{max_enrollment}"
+                available = 1 if is_open else 0
+            
+            enrolled = False
+            if available == 1:
+                logging.debug(f"Class {course_number} ({section_code}) is potentially open. Attempting to enroll...")
+                selection_key = selection.get('key', 'N/A')
+                selection_va = selection.get('va', 'N/A')
+
+                if enrolled_courses is None:
+                    enrolled_courses = self._fetch_enrolled_courses(term)
+                if course_number in enrolled_courses:
+                    logging.debug(f"Already enrolled in {course_number} ({section_code})")
+                    continue
+
+                # Any enroll attempt may change the enrollment state, even one cut short by a network error,
+                # so a retried get_class_data must see it afresh rather than re-enroll from a cached result
+                self._enrollment_cache.pop(term, None)
+                if self.try_enroll(term, selection_key, selection_va):
+                    logging.debug(f"Successfully enrolled in {course_number} ({section_code})")
+                    enrolled = True
+                    enrolled_courses = enrolled_courses | {course_number}
                 else:
-                    waitlist_str = f"{waitlist_available}/{waitlist_cap}"
-                    seats_str = f"{max_enrollment - seats_available}/{max_enrollment}"
-                    available = 1 if is_open else 0
-                
-                enrolled = False
-                if available == 1:
-                    logging.debug(f"Class {course_number} ({section_code}) is potentially open. Attempting to enroll...")
-                    selection_block = course_section.find_parent("selection")
-                    selection_key = selection_block.attrs.get('key', 'N/A')
-                    selection_va = selection_block.attrs.get('va', 'N/A')
-
-                    if self.get_enrollment_status(term, course_number):
-                        logging.debug(f"Already enrolled in {course_number} ({section_code})")
-                        continue
-
-                    if self.try_enroll(term, selection_key, selection_va):
-                        logging.debug(f"Successfully enrolled in {course_number} ({section_code})")
-                        enrolled = True
-                    else:
-                        logging.debug(f"Failed to enroll in {course_number} ({section_code})")
-
-                class_data.append({
-                    "Course Number": course_number,
-                    "Course Code": section_code,
-                    "Term": self.terms[term]["name"],
-                    "College": college,
-                    "Instructor": course_section.attrs.get('teacher', 'N/A'),
-                    "Time": self._build_time(valid_timeblock_ids, timeblocks_map),
-                    "Waitlist": waitlist_str,
-                    "Seats": seats_str,
-                    "Available": available,
-                    "enrolled": enrolled
-                })
+                    logging.debug(f"Failed to enroll in {course_number} ({section_code})")
+
+            class_data.append(Section(
+                course_number=course_number,
+                code=section_code,
+                term=self.terms[term]["name"],
+                college=college,
+                instructor=course_section.get('teacher', 'N/A'),
+                time=self._build_time(valid_timeblock_ids, timeblocks_map),
+                waitlist=waitlist_str,
+                seats=seats_str,
+                available=available,
+                enrolled=enrolled
+            ))
         logging.debug(f"Retrieved class data: {class_data}")
         return class_data
 
 
-if __name__ == "__main__":
-    CONFIG_FILE = "config.yaml"
-    username = None
-    password = None
-    discord_webhook_url = None
+def send_discord_notifications(session: requests.Session, webhook_url: str, notifications: list[tuple[str | None, dict]]) -> None:
+    """Posts (content, embed) notifications to a Discord webhook, batching as many embeds per message as Discord allows."""
+    for start in range(0, len(notifications), DISCORD_MAX_EMBEDS):
+        chunk = notifications[start:start + DISCORD_MAX_EMBEDS]
+        payload = {"embeds": [embed for _, embed in chunk]}
+        content = "\n".join(content for content, _ in chunk if content)
+        if content:
+            payload["content"] = content
 
-    load_dotenv()
+        while True:
+            response = session.post(webhook_url, json=payload)
+            if response.status_code != 429:
+                break
+            retry_after = float(response.headers.get("Retry-After", 1))
+            logging.warning(f"Discord rate limit hit. Retrying in {retry_after} seconds...")
+            time.sleep(retry_after)
 
-    username = os.getenv('CUNY_USERNAME')
-    password = os.getenv('CUNY_PASSWORD')
-    discord_webhook_url = os.getenv('DISCORD_WEBHOOK_URL')
-    discord_user_id = os.getenv('DISCORD_USER_ID', '')
-    logging.info("Loaded credentials using python-dotenv")
+        # Only wait when the webhook bucket is actually exhausted
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            time.sleep(float(response.headers.get("X-RateLimit-Reset-After", 1)))
 
-    if not username or not password or not discord_webhook_url:
-        logging.error("Error: 'USERNAME' or 'PASSWORD' or 'DISCORD_WEBHOOK_URL' not found in the .env file or environment variables.")
-        exit(1)
-
-    cuny_client = CUNY(username.lower(), password)
-
-    if not cuny_client.cookies:
-        logging.error("Login failed. Cannot retrieve class data.")
-        exit(1)
 
+def check_classes(cuny_client: CUNY, course_names: list[str], course_codes: list[str], discord_webhook_url: str, discord_user_id: str) -> None:
+    """Runs one check of every watched section and sends the resulting Discord notifications."""
     logging.info("Fetching available terms...")
     terms = cuny_client._get_term()
 
     class_data = []
-    course_names = os.getenv('COURSE_NAMES').split(',')
-    course_codes = os.getenv('COURSE_CODES').split(',')
-
-    if not course_names or not course_codes:
-        logging.error("Error: 'COURSE_NAMES' or 'COURSE_CODES' not found in the .env file or environment variables.")
-        exit(1)
-
-    for term_id, term_data in terms.items():
-        if term_data["enrollable"]:
-            logging.info(f"Fetching class data for term {term_data['name']}...")
-            class_data.extend(cuny_client.get_class_data(
+    # Built once and shared by every term worker; frozenset() of a frozenset is a no-op
+    target_codes = frozenset(course_codes)
+    enrollable_terms = [term_id for term_id, term_data in terms.items() if term_data["enrollable"]]
+    for term_id in enrollable_terms:
+        logging.info(f"Fetching class data for term {terms[term_id]['name']}...")
+
+    # Terms are independent of each other, so fetch them concurrently over the shared session
+    with ThreadPoolExecutor(max_workers=max(min(len(enrollable_terms), 4), 1)) as executor:
+        futures = [
+            executor.submit(
+                cuny_client.get_class_data,
                 term=term_id,
                 course_names=course_names,
-                course_codes=course_codes
-            ))
-
-    course_map = {course_data["Course Code"]: course_data for course_data in class_data}
+                course_codes=target_codes
+            )
+            for term_id in enrollable_terms
+        ]
+        # Collected in submission order so a code found in several terms always resolves to the last term's section
+        for future in futures:
+            class_data.extend(future.result())
+
+    course_map = {section.code: section for section in class_data}
+    notifications = []
     for course_code in course_codes:
         if course_code not in course_map:
             embed = {
@@ -430,47 +672,93 @@ if __name__ == "__main__":
                 "description": "The specified course code could not be found in the fetched data for any enrollable term. Please double-check the code.",
                 "color": 0xFF0000
             }
-            payload = {
-                "embeds": [embed]
-            }
-            requests.post(discord_webhook_url, json=payload)
-            time.sleep(1)
+            notifications.append((None, embed))
             continue
 
         course_info = course_map[str(course_code)]
-        if course_info["Available"] == 1 and not course_info["enrolled"]:
+        if course_info.available == 1 and not course_info.enrolled:
             embed = {
-                "title": f"✅ Class Potentially Open: {course_info['Course Number']} ({course_code}) {course_info['College']}",
-                "description": f"Term: {course_info['Term']}",
+                "title": f"✅ Class Potentially Open: {course_info.course_number} ({course_code}) {course_info.college}",
+                "description": f"Term: {course_info.term}",
                 "color": 0x00FF00,
                 "fields": [
-                    {"name": "Instructor", "value": course_info['Instructor'], "inline": True},
-                    {"name": "Seats", "value": course_info['Seats'], "inline": True},
-                    {"name": "Waitlist", "value": course_info['Waitlist'], "inline": True},
-                    {"name": "Time", "value": course_info['Time'], "inline": True},
+                    {"name": "Instructor", "value": course_info.instructor, "inline": True},
+                    {"name": "Seats", "value": course_info.seats, "inline": True},
+                    {"name": "Waitlist", "value": course_info.waitlist, "inline": True},
+                    {"name": "Time", "value": course_info.time, "inline": True},
                 ]
             }
-            payload = {
-                "content": f"<@{discord_user_id}> Class **{course_info['Course Number']} ({course_code})** might be open!",
-                "embeds": [embed]
-            }
-            requests.post(discord_webhook_url, json=payload)
-            logging.debug(f"Sent Discord notification for course {course_code}.")
-        elif course_info["enrolled"]:
+            content = f"<@{discord_user_id}> Class **{course_info.course_number} ({course_code})** might be open!"
+            notifications.append((content, embed))
+        elif course_info.enrolled:
             embed = {
-                "title": f"✅ Successfully Enrolled: {course_info['Course Number']} ({course_code})",
-                "description": f"Term: {course_info['Term']}",
+                "title": f"✅ Successfully Enrolled: {course_info.course_number} ({course_code})",
+                "description": f"Term: {course_info.term}",
                 "color": 0x00FF00,
                 "fields": [
-                    {"name": "Instructor", "value": course_info['Instructor'], "inline": True},
-                    {"name": "Seats", "value": course_info['Seats'], "inline": True},
-                    {"name": "Waitlist", "value": course_info['Waitlist'], "inline": True},
-                    {"name": "Time", "value": course_info['Time'], "inline": True},
+                    {"name": "Instructor", "value": course_info.instructor, "inline": True},
+                    {"name": "Seats", "value": course_info.seats, "inline": True},
+                    {"name": "Waitlist", "value": course_info.waitlist, "inline": True},
+                    {"name": "Time", "value": course_info.time, "inline": True},
                 ]
             }
-            payload = {
-                "content": f"<@{discord_user_id}> Successfully enrolled in **{course_info['Course Number']} ({course_code})**!",
-                "embeds": [embed]
-            }
-            requests.post(discord_webhook_url, json=payload)
-            logging.debug(f"Sent Discord notification for course {course_code}.")
+            content = f"<@{discord_user_id}> Successfully enrolled in **{course_info.course_number} ({course_code})**!"
+            notifications.append((content, embed))
+
+    # Kept separate from the CUNY session so its cookies are never sent to Discord
+    with requests.Session() as discord_session:
+        send_discord_notifications(discord_session, discord_webhook_url, notifications)
+    logging.debug(f"Sent {len(notifications)} Discord notification(s).")
+
+
+if __name__ == "__main__":
+    CONFIG_FILE = "config.yaml"
+    MAX_POLL_DELAY = 30 * 60
+    username = None
+    password = None
+    discord_webhook_url = None
+
+    load_dotenv()
+
+    username = os.getenv('CUNY_USERNAME')
+    password = os.getenv('CUNY_PASSWORD')
+    discord_webhook_url = os.getenv('DISCORD_WEBHOOK_URL')
+    discord_user_id = os.getenv('DISCORD_USER_ID', '')
+    logging.info("Loaded credentials using python-dotenv")
+
+    if not username or not password or not discord_webhook_url:
+        logging.error("Error: 'USERNAME' or 'PASSWORD' or 'DISCORD_WEBHOOK_URL' not found in the .env file or environment variables.")
+        exit(1)
+
+    cuny_client = CUNY(username.lower(), password, cookie_file=os.getenv('COOKIE_FILE'))
+
+    if not cuny_client.session.cookies:
+        logging.error("Login failed. Cannot retrieve class data.")
+        exit(1)
+
+    course_names = os.getenv('COURSE_NAMES').split(',')
+    course_codes = os.getenv('COURSE_CODES').split(',')
+
+    if not course_names or not course_codes:
+        logging.error("Error: 'COURSE_NAMES' or 'COURSE_CODES' not found in the .env file or environment variables.")
+        exit(1)
+
+    poll_interval = int(os.getenv('POLL_INTERVAL', '0'))
+    delay = poll_interval
+    while True:
+        try:
+            check_classes(cuny_client, course_names, course_codes, discord_webhook_url, discord_user_id)
+            delay = poll_interval
+        except (CUNYException, requests.exceptions.RequestException) as e:
+            if not poll_interval:
+                raise
+            # Back off between failed cycles so an outage isn't hammered every interval
+            delay = min(delay * 2, max(MAX_POLL_DELAY, poll_interval))
+            logging.error(f"Check failed: {e}. Retrying in {delay} seconds...")
+        finally:
+            # Cookies the server refreshed during the cycle are kept for the next run
+            cuny_client._save_cookies()
+
+        if not poll_interval:
+            break
+        time.sleep(delay)